@@ -1,12 +1,10 @@
 #For creating package
-from pkg_resources import get_distribution, DistributionNotFound
+from importlib.metadata import version, PackageNotFoundError
 
 try:
-    dist = get_distribution("Tabalchi")
-except DistributionNotFound:
+    __version__ = version("Tabalchi")
+except PackageNotFoundError:
     __version__ = "Please install Tabalchi with setup.py"
-else:
-    __version__ = dist.version
 
 #Package Modules
 from .main import*
@@ -1,26 +1,24 @@
 #(C) Shreyan Mitra
 
 #Imports
+from __future__ import annotations #Must come before every other import
 import json #For parsing .tabla files
-from jsonschema import validate #For checking .tabla files for validity
-from __future__ import annotations
+import math #For comparing syllable totals
+import re #For tokenizing beats
+from jsonschema import validators, ValidationError #For checking .tabla files for validity
 from abc import ABC, abstractmethod #For defining abstract classes
-from playsound import playsound #For playing sounds
-from pydub.playback import play as pydubplay #Also for playing sounds
+from pydub.playback import play as pydubplay #For playing beats
 from pydub import AudioSegment #For merging and joining sounds
-import audio_effects as ae # For slowing down sounds
-import acoustid #For fingerprinting audio files
-import chromaprint #For decoding audio fingerprints
+import numpy as np #For mixing raw audio samples
 from typing import* #For type hints
 from types import SimpleNamespace #For accessing dictionary field using dot notation
+from functools import cached_property, lru_cache #For decoding each recording only once, and memoizing string conversions
+from concurrent.futures import ThreadPoolExecutor #For decoding several recordings at once
 import os #For moving files
+import sys #For interning phrase ids
 from pathlib import Path #Also for moving files
 import warnings #For warnings
-from transformers import pipeline # For composition generation
-import torch #For model inference
 import random #For generating random speed if only speed class is provided
-from collections import OrderedDict #For representing an ordered mapping of phrases to actual number of syllables taken for each phrase
-import fsspec #For downloading recordings folder from Github
 
 #A class representing an interval of beats
 class BeatRange():
@@ -31,6 +29,8 @@ class BeatRange():
         begin(int): The start beat of the beat range, inclusive
         end(int): The end beat of the beat range, exclusive
     '''
+    __slots__ = ("begin", "end") #Beat ranges are plain value objects, so skip the per-instance __dict__
+
     def __init__(self, begin:int, end:int):
         assert begin < end, "BeatRange end beat must be greater than begin beat"
         self.begin = begin
@@ -58,13 +58,15 @@ class BeatRange():
             ranges(List[BeatRange]): A list of beat ranges
             totalBeats(int): The total number of beats in the sequence to check the ranges against
         '''
-        ranges = sorted(ranges, lambda range: range.begin)
-        for i in range(1, len(ranges)):
-            if ranges[i].begin != ranges[i-1].end:
+        covered = bytearray(totalBeats + 1) #Marks each beat once a range contains it. Index 0 is unused
+        for beatRange in ranges:
+            if beatRange.begin < 1 or beatRange.begin > totalBeats: #The range starts outside the sequence
                 return False
-        if(ranges[-1].end < totalBeats or ranges[0].begin != 1):
-            return False
-        return True
+            end = min(beatRange.end, totalBeats + 1) #End beats are exclusive
+            if covered.find(1, beatRange.begin, end) != -1: #The range overlaps an earlier one
+                return False
+            covered[beatRange.begin:end] = b"\x01" * (end - beatRange.begin)
+        return covered.count(0) == 1 #Every beat except the unused index 0 is covered exactly once, so there are no gaps
 
     @classmethod
     def getSubsequence(cls, ranges:List[Self], begin:int, end:int) -> List[Self]:
@@ -77,23 +79,53 @@ class BeatRange():
             end(int): The end beat of the desired sequence
         '''
         subsequence = []
-        for i in range(len(ranges)):
-            range = ranges[i]
-            if range.begin >= begin and range.end <= end:
-                subsequence.append(range)
-            elif range.begin >= begin and range.end > end:
-                subsequence.append(BeatRange(range.begin, end))
-            elif range.begin < begin and range.end <= end:
-                subsequence.append(BeatRange(begin, range.end))
-            else:
-                subsequence.append(BeatRange(begin, end))
-        return sorted(subsequence)
+        for beatRange in ranges:
+            if beatRange.begin < end and beatRange.end > begin: #Skip ranges entirely outside the desired sequence
+                subsequence.append(BeatRange(max(beatRange.begin, begin), min(beatRange.end, end)))
+        return sorted(subsequence, key = lambda beatRange: beatRange.begin)
+
+#A class mapping beat ranges to values, such as the speed or jati of different parts of a composition
+class BeatRangeMap():
+    '''
+    Class representing a mapping from non-overlapping beat ranges to values, stored as parallel lists sorted by begin beat
+
+    Parameters:
+        mapping(Dict[BeatRange, Any]): The beat ranges and the value associated with each
+    '''
+    __slots__ = ("begins", "ends", "values")
+
+    def __init__(self, mapping:Dict[BeatRange, Any]):
+        ranges = sorted(mapping, key = lambda beatRange: beatRange.begin)
+        self.begins = [beatRange.begin for beatRange in ranges]
+        self.ends = [beatRange.end for beatRange in ranges]
+        self.values = [mapping[beatRange] for beatRange in ranges]
+
+    def ranges(self) -> List[BeatRange]:
+        '''
+        Returns the beat ranges of this mapping, in sorted order
+        '''
+        return [BeatRange(begin, end) for begin, end in zip(self.begins, self.ends)]
+
+    def expand(self, totalBeats:int) -> list:
+        '''
+        Returns the value associated with every beat, in order, so that beats do not need to be looked up one at a time. Beats not in any range are given None
+
+        Parameters:
+            totalBeats(int): The number of beats to return values for
+        '''
+        values = [None] * totalBeats
+        for begin, end, value in zip(self.begins, self.ends, self.values):
+            begin, end = max(begin, 1), min(end, totalBeats + 1) #Only the part of the range within the composition
+            if begin < end:
+                values[begin - 1:end - 1] = [value] * (end - begin)
+        return values
 
 #A class representing a composition type. Ex. Kayda, Rela, etc.
 #For descriptions of the different types of tabla compositions, visit www.tablalegacy.com (not affiliated with this product or the author in any way)
 #Sometimes, differences between types of compositions are hard to quantify, and come down to the "feel" of the composition.
 class CompositionType():
     registeredTypes = {} # A class variable keeping track of the list of registered composition types
+    compiledValidators = {} #The validator built for each schema object and backend, so composition types sharing a schema only compile it once
     '''
     A class to represent a composition type
 
@@ -103,23 +135,37 @@ class CompositionType():
         validityCheck(Callable[[Bol],[bool]]): A function that returns whether a given Bol is of the composition type being considered
         assembler(Callable[[SimpleNamespace], [list[str]]]): Gives instructions on how to put together the disjointed components of the composition
         register(bool): Whether to register the composition type (i.e. to save it for future use). By default, True
+        backend(str): The library used to validate the components field against the schema, either "jsonschema" or "fastjsonschema". The latter compiles the schema into specialized Python code, which validates faster, but requires the fastjsonschema package. By default, "jsonschema"
     '''
-    def __init__(self, name:str, schema:dict, validityCheck:Callable[[Bol],[bool]], assembler:Callable[[SimpleNamespace], [list[str]]], register:bool = True):
+    def __init__(self, name:str, schema:dict, validityCheck:Callable[[Bol],[bool]], assembler:Callable[[SimpleNamespace], [list[str]]], register:bool = True, backend:str = "jsonschema"):
         self.name = name
         self.schema = schema
         self.assembler = assembler
+        if backend not in ("jsonschema", "fastjsonschema"):
+            raise ValueError("Invalid backend passed. Must be one of jsonschema or fastjsonschema.")
+        cached = CompositionType.compiledValidators.get((backend, id(schema)))
+        if cached is None or cached[0] is not schema: #The schema is kept alongside its validator, so a reused id is never mistaken for the same schema
+            if backend == "jsonschema":
+                validatorClass = validators.validator_for(schema)
+                validatorClass.check_schema(schema) #Check the schema itself once here, rather than every time a file is validated
+                cached = (schema, validatorClass(schema).validate, ValidationError)
+            else:
+                import fastjsonschema #Optional dependency, only needed for this backend
+                cached = (schema, fastjsonschema.compile(schema), fastjsonschema.JsonSchemaException)
+            CompositionType.compiledValidators[(backend, id(schema))] = cached
+        _, self.validate, self.validationError = cached
         def preValidityCheck(bol:dict) -> bool:
             try:
-                validate(instance = bol, schema = schema)
+                self.validate(bol)
                 return True
-            except Exception as e:
+            except self.validationError as e:
                 print(e)
                 return False
 
-        self.preCheck = preValidityCheck #This is used within the BolParser before BolParser turns the .tabla file into a Bol (Note to parser: only pass in components field here)
+        self.preCheck = preValidityCheck #Returns whether the components field of a .tabla file is valid. BolParser calls self.validate directly, which raises with the reason instead
         self.mainCheck = validityCheck #This is used within the BolParser with a fully instantiated Bol object
         if register:
-            CompositionType.registeredTypes.update({name: self})
+            CompositionType.registeredTypes[name] = self
 
 #A class representing something with an associated number. Ex. Taal, Jati, Speed, etc.
 class Numeric(ABC):
@@ -152,7 +198,7 @@ class Taal(Numeric):
             self.id = name
         self._theka = theka
         if register:
-            Taal.registeredTaals.update({self.id: self})
+            Taal.registeredTaals[self.id] = self
 
     @property
     def name(self):
@@ -180,7 +226,7 @@ class Jati(Numeric):
         else:
             self.id = name
         if register:
-            Jati.registeredJatis.update({self.id: self})
+            Jati.registeredJatis[self.id] = self
 
     @property
     def name(self):
@@ -192,6 +238,7 @@ class Jati(Numeric):
 #A class that represents a speed category
 class SpeedClasses:
     registeredSpeeds = {}
+    classifiedBPMs = {} #The speed class found for each bpm looked up so far. Cleared whenever a speed class is registered
     '''
     A class representing a Speed class
     '''
@@ -200,13 +247,14 @@ class SpeedClasses:
         self.generator = randomGenerate
         self.id = name
         if register:
-            SpeedClasses.registeredSpeeds.update({name: self})
+            SpeedClasses.registeredSpeeds[name] = self
+            SpeedClasses.classifiedBPMs.clear() #A new class may claim bpms that were classified before
 
     @classmethod
     def getSpeedClassFromBPM(cls, bpm:int) -> str:
-        for key, value in SpeedClasses.registeredSpeeds.items():
-            if value.check(bpm):
-                return key
+        if bpm not in SpeedClasses.classifiedBPMs:
+            SpeedClasses.classifiedBPMs[bpm] = next((key for key, value in SpeedClasses.registeredSpeeds.items() if value.check(bpm)), None)
+        return SpeedClasses.classifiedBPMs[bpm]
 
 #A class that represents a specific speed
 class Speed(Numeric):
@@ -232,7 +280,7 @@ class Speed(Numeric):
 
 class Notation(ABC):
 
-    VALID_NOTATIONS = ["Bhatkande", "Paluskar"] #No registered here because there can only be two types of notation
+    VALID_NOTATIONS = {} #No registered here because there can only be two types of notation. Maps each name to its class, filled in once the classes are defined
 
     @classmethod
     @abstractmethod
@@ -251,6 +299,8 @@ class Bhatkande(Notation):
 class Paluskar(Notation):
     pass
 
+Notation.VALID_NOTATIONS.update({"Bhatkande": Bhatkande, "Paluskar": Paluskar})
+
 class Bol():
     '''
     A class representing a bol, a collection of beats
@@ -258,14 +308,9 @@ class Bol():
     def __init__(self, beats:list[Beat], notationClass:Union[Type[Notation], None] = None):
         self.beats = beats
         self.notationClass = notationClass
-        self.markedBeats = []
-        self.markedPhrases = []
-        for beat in beats:
-            lst = beat.phrases
-            for i in range(len(lst)):
-                if(beat.markers[i] == 1):
-                    self.markedBeats.append(beat)
-                    self.markedPhrases.append(lst[i][0])
+        marked = [(beat, phrase) for beat in beats for (phrase, _), marker in zip(beat.phrases, beat.markers) if marker == 1] #Every phrase marked with ~, alongside its beat
+        self.markedBeats = [beat for beat, _ in marked]
+        self.markedPhrases = [phrase for _, phrase in marked]
 
     def play(self):
         for beat in self.beats:
@@ -283,35 +328,60 @@ class Beat():
     '''
     A class representing a collection of phrases
     '''
-    def __init__(self, number:int, taaliKhaliOrNone:Literal[-1,0,1], saam:bool, phrases:list[tuple], speed:int, markers:list[Literal[0,1]]):
+    def __init__(self, number:int, taaliKhaliOrNone:Literal[-1,0,1], saam:bool, phrases:list[tuple], speed:int, markers:Sequence[Literal[0,1]]):
         self.number = number
-        assert len(markers) == len(phrases), "Invalid length for marker array. At beat number " + str(number) + ". \nMarkers: " + str(markers) + "\nPhrases: " + str(phrases)
+        assert len(markers) == len(phrases), "Invalid length for marker array. At beat number " + str(number) + ". \nMarkers: " + str(list(markers)) + "\nPhrases: " + str(phrases)
         self.markers = markers
         self.clap = taaliKhaliOrNone
         self.saam = saam
         self.speed = speed
         duration = 60.0/speed #In seconds (this is the duration of the entire beat)
-        jati = 0
-        for item in phrases:
-            jati += item[1]
+        jati = sum(syllables for _, syllables in phrases)
         syllableDuration = duration/jati #This is duration of a specific segment of the beat
-        self.multipliers = []
-        self.soundFiles = []
-        for item in phrases:
-            phrase = item[0]
-            syllables = item[1]
-            self.multipliers.append(((syllables*1.0)/phrase.syllables) * (syllableDuration/0.25)) #Since, in the original recording, one syllable = 0.25 seconds
-            self.soundFiles.append(phrase.soundBite.recording)
+        stretch = syllableDuration/0.25 #Since, in the original recording, one syllable = 0.25 seconds
+        self.multipliers = [((syllables*1.0)/phrase.syllables) * stretch for phrase, syllables in phrases]
         self.phrases = phrases
 
+    @cached_property
+    def sounds(self) -> list[Sound]:
+        '''
+        The Sound of each phrase, whose decoded audio is cached across beats. Only fetched the first time the beat is played or its sounds are needed, so parsing does no audio work
+        '''
+        return [phrase.soundBite for phrase, _ in self.phrases]
+
+    @cached_property
+    def soundFiles(self) -> list[str]:
+        '''
+        The recording of each phrase in this beat
+        '''
+        return [sound.recording for sound in self.sounds]
+
+    @staticmethod
+    def validate(phrases:list[tuple], speed:int, markers:Sequence[Literal[0,1]]) -> Union[str, None]:
+        '''
+        Checks whether a beat can be built from the given arguments, without raising
+
+        Parameters:
+            phrases(list[tuple]): Each phrase of the beat, alongside the number of syllables it takes up
+            speed(int): The speed of the beat, in bpm
+            markers(Sequence[Literal[0,1]]): Whether each phrase is marked with ~
+
+        Returns:
+            problem(str or None): Why the beat cannot be built, or None if it can
+        '''
+        if len(markers) != len(phrases):
+            return "Invalid length for marker array."
+        if not speed or speed < 0:
+            return "The speed must be a positive number of bpm."
+        if not phrases or sum(syllables for _, syllables in phrases) <= 0:
+            return "The beat has no syllables."
+        if any(phrase.syllables <= 0 for phrase, _ in phrases):
+            return "A phrase in the beat has no syllables."
+        return None
+
     def play(self):
-        for index in range(len(self.soundFiles)):
-            s = AudioSegment.from_file(self.soundFiles[index])
-            if self.multipliers[index] >= 1:
-                s = s.speedup(self.multipliers[index])
-            else:
-                s = ae.speed_down(s, self.multipliers[index])
-            pydubplay(s)
+        for sound, multiplier in zip(self.sounds, self.multipliers):
+            pydubplay(sound.render(multiplier)) #Rendered only once per Sound and speed, however many beats use it
 
 
 
@@ -319,6 +389,23 @@ class Beat():
 
 class Fetcher:
     #Class that contains several static methods involving fetching sounds and variables
+    recordingsFetched = False #Whether the recordings folder has been checked this session
+
+    @classmethod
+    def fetchRecordings(cls):
+        '''
+        Download the recordings folder from Github, unless every registered recording is already present locally. Only checked the first time a recording is needed, rather than on import
+        '''
+        if Fetcher.recordingsFetched:
+            return
+        destination = Path.cwd() / "recordings"
+        destination.mkdir(exist_ok=True, parents=True)
+        if not all(os.path.exists(sound.recording) for sound in Sound.sounds.values()): #Download recordings folder if it does not exist already
+            import fsspec #Imported here since it is only needed for downloading recordings
+            fs = fsspec.filesystem("github", org="shreyanmitra", repo="Tabalchi")
+            fs.get(fs.ls("recordings/"), destination.as_posix(), recursive=True)
+        Fetcher.recordingsFetched = True
+
     @classmethod
     def fetch(cls, id, specifier = None, componentIDs = None) -> Sound:
         '''
@@ -343,46 +430,146 @@ class Fetcher:
         #For both of the following cases, componentIDs must also be specified
         elif specifier == "composite": #A composite sound consists of two sounds played at the same time. Ex. dha = ge + na
             assert componentIDs, "Need to specify component ids for composite phrases."
-            newSound = Sound(id, Sound.merge(Sound.sounds.get(c) for c in componentIDs)) #Create a new sound by using the Sound class' static merge function
+            key = (specifier, tuple(sorted(componentIDs))) #The order of simultaneous sounds does not matter
+            if key not in Sound.synthesized:
+                Sound.synthesized[key] = Sound.merge(Fetcher.fetchComponents(componentIDs)) #Create a new recording by using the Sound class' static merge function
+            newSound = Sound(id, Sound.synthesized[key])
             return newSound #The new sound will be stored in Sound.sounds, but we return it anyway for convenience
         elif specifier == "sequential": #A sequential sound consists of a sequence of sounds played in succession Ex. terekite = te, re, ki, te
             assert componentIDs, "Need to specify component ids for sequential phrases."
-            newSound = Sound(id, Sound.join(Sound.sounds.get(c) for c in componentIDs)) #Create a new sound by using the Sound class' static join function
+            key = (specifier, tuple(componentIDs))
+            if key not in Sound.synthesized:
+                Sound.synthesized[key] = Sound.join(Fetcher.fetchComponents(componentIDs)) #Create a new recording by using the Sound class' static join function
+            newSound = Sound(id, Sound.synthesized[key])
             return newSound #The new sound will be stored in Sound.sounds, but we return it anyway for convenience
         else: #At this point, the specifier was not one of ["composite", "sequential"] and we do not know what to do
             raise ValueError("Invalid specifier passed.")
 
+    @classmethod
+    def fetchComponents(cls, componentIDs) -> list[Sound]:
+        '''
+        Fetch the Sound objects making up a composite or sequential sound, in the order given
+
+        Parameters:
+            componentIDs(list[string]): A list of the identifiers making up a composite or sequential phrase
+
+        Returns:
+            components(list[Sound]): The Sound instances representing the given ids
+
+        Throws:
+            ValueError: if any of the ids is not a registered phrase
+        '''
+        phrases = [Phrase.registeredPhrases.get(c) for c in componentIDs] #Resolved through the phrase registry, so aliases and components that are themselves synthesized work too
+        if None in phrases:
+            raise ValueError("Did not find phrases " + str([c for c, phrase in zip(componentIDs, phrases) if phrase is None]) + ". Register the component phrases first.")
+        return [phrase.soundBite for phrase in phrases] #Fetches or synthesizes each component's Sound if it has not been yet
 
     @classmethod
     def addRecording(cls, file):
         '''
         A method to add an audio file recording to the recordings folder.
-            file(str): Path to MIDI file
+            file(str): Path to the audio file
+
+        Returns:
+            fileName(str): The name of the recording within the recordings folder, as expected by Sound
         '''
-        os.rename(file, "recordings/" + os.path.basename(file))
+        Path("recordings").mkdir(exist_ok = True) #Only the folder is needed, not the downloaded recordings
+        fileName = os.path.basename(file)
+        os.replace(file, "recordings/" + fileName) #Atomically overwrites an older recording with the same name
+        return fileName
 
 class Sound():
     sounds = {}
+    synthesized = {} #Recordings already created by merge/join, keyed by specifier and component ids
     '''
     Class that represents the soundbite associated with a particular phrase
 
     Class Variables:
         sounds(dict): stores all instantiated sounds
+        synthesized(dict): stores the recordings created for composite and sequential sounds, so they are only synthesized once
 
     Parameters:
         id(string): The unique identifier of the soundbite, typically the name of the associated phrase
         recording(string): The file name of a audio file in the recordings/ folder. The reocrding must be 0.25 second per syllable, i.e. equivalent to playing Chatusra Jati at 60 bpm
     '''
+    def __new__(cls, id, recording):
+        existing = Sound.sounds.get(id)
+        if existing is not None and existing.recording == "recordings/" + recording:
+            return existing #This exact sound already exists, so reuse it instead of creating a duplicate
+        return super().__new__(cls)
+
     def __init__(self, id, recording):
+        if Sound.sounds.get(id) is self: #Reused by __new__, nothing to set up
+            return
         self.id = id #Store the identifier
         self.recording = "recordings/" + recording #Store the recording
-        Sound.sounds.update({id: self}) #We have created a new sound!
+        self.renderings = {} #This sound resampled to different speeds, keyed by multiplier
+        Sound.sounds[id] = self #We have created a new sound!
 
-    def play(self):
+    def play(self, block:bool = True):
         '''
         Plays the sound represented by this Sound object
+
+        Parameters:
+            block(bool): Whether to wait for the sound to finish playing before returning. By default, True
         '''
-        playsound(self.recording)
+        from playsound import playsound #Imported here since it is only needed for playing single sounds
+        Fetcher.fetchRecordings()
+        playsound(self.recording, block)
+
+    @cached_property
+    def segment(self):
+        '''
+        The decoded audio of this sound. The recording is only read from disk the first time it is needed
+        '''
+        Fetcher.fetchRecordings()
+        return AudioSegment.from_file(self.recording)
+
+    def render(self, multiplier:float):
+        '''
+        Returns the decoded audio of this sound, sped up or slowed down by the given multiplier. Each speed is only rendered once
+
+        Parameters:
+            multiplier(float): How many times faster to play the sound. Values below 1 slow it down
+        '''
+        if multiplier not in self.renderings:
+            import audio_effects as ae #Imported here since it is only needed for slowing down sounds
+            self.renderings[multiplier] = self.segment.speedup(multiplier) if multiplier >= 1 else ae.speed_down(self.segment, multiplier)
+        return self.renderings[multiplier]
+
+    @classmethod
+    def loadSegments(cls, sounds) -> list:
+        '''
+        Returns the decoded audio of each given sound. Sounds that have not been decoded yet are decoded in parallel, since decoding is mostly spent outside the interpreter
+
+        Parameters:
+            sounds(list[Sound]): the sounds to decode
+
+        Returns:
+            segments(list[AudioSegment]): the decoded audio of each sound, in the order given
+        '''
+        Fetcher.fetchRecordings()
+        undecoded = [sound for sound in dict.fromkeys(sounds) if "segment" not in sound.__dict__]
+        if len(undecoded) > 1:
+            with ThreadPoolExecutor(max_workers = min(8, len(undecoded))) as executor:
+                for sound, segment in zip(undecoded, executor.map(lambda sound: AudioSegment.from_file(sound.recording), undecoded)):
+                    sound.segment = segment #Fill in the cached property
+        return [sound.segment for sound in sounds]
+
+    @classmethod
+    def isUpToDate(cls, fileName:str, sounds) -> bool:
+        '''
+        Returns whether a recording synthesized from the given sounds already exists and is newer than every one of their recordings, so it can be reused instead of synthesized again
+
+        Parameters:
+            fileName(str): The name of the synthesized recording within the recordings folder
+            sounds(list[Sound]): the component sounds it was synthesized from
+        '''
+        try:
+            synthesized = os.path.getmtime("recordings/" + fileName)
+            return all(os.path.getmtime(sound.recording) <= synthesized for sound in sounds)
+        except OSError: #Either the synthesized recording or a component recording does not exist
+            return False
 
     @classmethod
     def merge(cls, sounds) -> str:
@@ -393,16 +580,23 @@ class Sound():
             sounds(list[Sound]): the individual component sounds to play
 
         Returns:
-            newRecording(string): An audio file containing the combination requested
+            newRecording(string): An audio file in the recordings/ folder containing the combination requested
         '''
         assert len(sounds) > 1, "More than 1 sound must be provided to merge"
-        mergedSound = AudioSegment.from_file(sounds[0].recording)
-        fileName = sounds[0].id
-        for i in range(1, len(sounds)):
-            mergedSound = mergedSound.overlay(AudioSegment.from_file(sounds[i].recording), position = 0)
-            fileName += "+" + sounds[i].id
-        fileName = "recordings/" + fileName + ".m4a"
-        handler = mergedSound.export(fileName, format = "ipod")
+        Fetcher.fetchRecordings()
+        fileName = "+".join(sound.id for sound in sounds) + ".wav" #Uncompressed, so no encoder runs for synthesized sounds
+        if Sound.isUpToDate(fileName, sounds): #Synthesized in an earlier session
+            return fileName
+        #Bring every component to a common frame rate, channel count and 16-bit sample width
+        segments = AudioSegment._sync(*[segment.set_sample_width(2) for segment in Sound.loadSegments(sounds)])
+        channels = segments[0].channels
+        samples = [np.frombuffer(segment.raw_data, dtype = np.int16).reshape(-1, channels) for segment in segments]
+        #Mix all components in a single pass, padding shorter ones with silence instead of truncating to the first
+        mix = np.zeros((max(len(sample) for sample in samples), channels), dtype = np.int32)
+        for sample in samples:
+            mix[:len(sample)] += sample
+        mergedSound = segments[0]._spawn(np.clip(mix, -32768, 32767).astype(np.int16).tobytes())
+        handler = mergedSound.export("recordings/" + fileName, format = "wav")
         return fileName
 
 
@@ -415,20 +609,24 @@ class Sound():
         sounds(list[Sound]): the individual component sounds to play
 
         Returns:
-        newRecording(string): An audio file containing the combination requested
+        newRecording(string): An audio file in the recordings/ folder containing the combination requested
         '''
         assert len(sounds) > 1, "More than 1 sound must be provided to join"
-        mergedSound = AudioSegment.from_file(sounds[0].recording)
-        fileName = sounds[0].id
-        for i in range(1, len(sounds)):
-            mergedSound = mergedSound + AudioSegment.from_file(sounds[i].recording)
-            fileName += sounds[i].id
-        fileName = "recordings/" + fileName + ".m4a"
-        handler = mergedSound.export(fileName, format = "ipod")
+        Fetcher.fetchRecordings()
+        fileName = "-".join(sound.id for sound in sounds) + ".wav" #Separated, so different sequences never share a file. Uncompressed, so no encoder runs for synthesized sounds
+        if Sound.isUpToDate(fileName, sounds): #Synthesized in an earlier session
+            return fileName
+        #Bring every component to a common format, then concatenate the raw audio in one pass instead of copying the accumulated sound for each component
+        segments = AudioSegment._sync(*Sound.loadSegments(sounds))
+        mergedSound = segments[0]._spawn(b"".join(segment.raw_data for segment in segments))
+        handler = mergedSound.export("recordings/" + fileName, format = "wav")
         return fileName
 
 class Phrase():
     registeredPhrases = {} #The phrases that have been registered so far
+    registeredDescriptions = None #The descriptions of all registered phrases, joined for generation prompts. Reset whenever a phrase is registered
+    DRUMS = frozenset(("baiyan", "daiyan")) #The positions of phrases played on a single drum
+    createdPhrases = {} #Registered composite and sequential phrases, keyed by their definition, so repeated definitions are only built once
     '''
     Class that represents a phrase on the tabla
 
@@ -444,27 +642,47 @@ class Phrase():
     def __init__(self, mainID, syllables = 1, position = 'baiyan', info = 'No info provided', aliases = None, soundBite = "Fetch", register = True):
         if not isinstance(soundBite, Sound) and soundBite != "Fetch":
             soundBite = Sound(mainID, soundBite) #We have a path to an audio file and need to convert it to a Sound object. The audio file should be in the recordings folder
-        mainID = mainID.lower() #Lowercase all letters for consistency
+        mainID = sys.intern(mainID.lower()) #Lowercase all letters for consistency, and intern since ids are used as registry keys
         #Below, keep track of all possible names of the phrase
         self.ids = [mainID]
         if aliases:
-            self.ids += aliases
+            self.ids += [sys.intern(alias.lower()) for alias in aliases]
         #Construct a description of the phrase for playing purposes
         self.description = "Phrase: " + str(self.ids) + "\nPlayed on " + position + ".\n" + info + "\n No. of syllables: " + str(syllables)
         #Set other class variables
         self.syllables = syllables
         self.position = position
         self.info = info
-        self.soundBite = soundBite if soundBite != "Fetch" else Fetcher.fetch(mainID) #Fetch sound bite if needed
+        self._soundBite = soundBite if soundBite != "Fetch" else None #Fetched when first needed, see soundBite below
+        self.fetchArguments = (mainID,) #How to fetch the sound bite if it was not given
         if register:
             for id in self.ids:
-                Phrase.registeredPhrases.update({id: self}) #Register the phrases by updating the static dictionary
+                Phrase.registeredPhrases[id] = self #Register the phrases in the static dictionary
+            Phrase.registeredDescriptions = None #The registry changed, so the joined descriptions must be rebuilt
 
     def __repr__(self):
         return str(self.ids[0]) #A phrase is uniquely represented by its name
 
-    def play(self):
-        self.soundBite.play() #Use the Sound instance's play method to play the phrase
+    @property
+    def soundBite(self) -> Sound:
+        '''
+        The Sound associated with this phrase. If it was not given when the phrase was created, it is fetched (or synthesized) the first time it is needed, so defining phrases that are never played does no audio work
+        '''
+        if self._soundBite is None:
+            self._soundBite = Fetcher.fetch(*self.fetchArguments)
+        return self._soundBite
+
+    def play(self, block:bool = True):
+        self.soundBite.play(block) #Use the Sound instance's play method to play the phrase
+
+    @classmethod
+    def getRegisteredDescriptions(cls) -> str:
+        '''
+        Returns the descriptions of all registered phrases, one per line, each prefixed by the id it is registered under. The result is reused until another phrase is registered
+        '''
+        if Phrase.registeredDescriptions is None:
+            Phrase.registeredDescriptions = "\n".join(key + "." + val.description for key, val in Phrase.registeredPhrases.items())
+        return Phrase.registeredDescriptions
 
     @classmethod
     def createCompositePhrase(cls, mainID, componentIDs, aliases = None, soundBite = "Fetch", register = True):
@@ -480,16 +698,32 @@ class Phrase():
 
         Returns:
         x(Phrase): The sequential phrase
-        '''
-        assert len(componentIDs) == 2, "A composite phrase must have exactly 2 component phrases"
-        assert componentIDs[0] in Phrase.registeredPhrases and componentIDs[1] in Phrase.registeredPhrases, "Must register component phrases first"
-        component1 = Phrase.registeredPhrases[componentIDs[0]]
-        component2 = Phrase.registeredPhrases[componentIDs[1]]
-        assert component1.position != component2.position and component1.position in ["baiyan", "daiyan"] and component2.position in ["baiyan", "daiyan"], "Components must be played on different drums and cannot be composite components themselves. For components played in close succession on the same drum, see registerSequentialPhrase()"
 
-        x = Phrase(mainID = mainID, syllables = max(component1.syllables, component2.syllables), position = "both drums", info = "Play the following two phrases simultaneously: \n1)" + component1.info + "\n2)" + component2.info, aliases = aliases, soundBite = soundBite if soundBite else fetch(mainID, "composite", componentIDs), register = register)
+        Throws:
+            ValueError: if there are not exactly two registered components played on different drums
+        '''
+        registeredPhrases = Phrase.registeredPhrases
+        componentIDs = tuple(sys.intern(id) for id in componentIDs) #Interned like registered ids, so registry lookups compare by identity
+        key = ("composite", mainID.lower(), componentIDs)
+        existing = Phrase.createdPhrases.get(key)
+        reusable = not aliases and (soundBite is None or soundBite == "Fetch") #New aliases or a new sound bite must be applied, so the phrase is rebuilt
+        if register and reusable and existing is not None and registeredPhrases.get(existing.ids[0]) is existing:
+            return existing #The same phrase was already built and is still registered
+        #Raise instead of asserting, so these checks still run under python -O
+        if len(componentIDs) != 2:
+            raise ValueError("A composite phrase must have exactly 2 component phrases")
+        component1 = registeredPhrases.get(componentIDs[0])
+        component2 = registeredPhrases.get(componentIDs[1])
+        if component1 is None or component2 is None:
+            raise ValueError("Must register component phrases first")
+        if component1.position == component2.position or component1.position not in Phrase.DRUMS or component2.position not in Phrase.DRUMS:
+            raise ValueError("Components must be played on different drums and cannot be composite components themselves. For components played in close succession on the same drum, see createSequentialPhrase()")
+
+        x = Phrase(mainID = mainID, syllables = max(component1.syllables, component2.syllables), position = "both drums", info = f"Play the following two phrases simultaneously: \n1){component1.info}\n2){component2.info}", aliases = aliases, soundBite = soundBite or "Fetch", register = register)
+        x.fetchArguments = (x.ids[0], "composite", componentIDs) #If no sound bite was given, synthesize it from the components when first needed
         if register:
-            assert mainID in Phrase.registeredPhrases, "Registering composite phrase failed."
+            assert mainID in registeredPhrases, "Registering composite phrase failed."
+            Phrase.createdPhrases[key] = x
         return x
 
     @classmethod
@@ -508,23 +742,108 @@ class Phrase():
         Returns:
         x(Phrase): The sequential phrase
         '''
-        assert all([id in Phrase.registeredPhrases for id in componentIDs]), "Must register component phrases first."
-        syllables = 0
-        info = "Play the following phrases in succession:"
-        for i in range(len(componentIDs)):
-            syllables += Phrase.registeredPhrases[componentIDs[i]].syllables
-            info += "\n" + str(i) + ")" + Phrase.registeredPhrases[componentIDs[i]].info
-
-        x = Phrase(mainID = mainID, syllables = syllables, position = position, info = info, aliases = aliases, soundBite = soundBite if soundBite else fetch(mainID, "sequential", componentIDs), register = register)
+        registeredPhrases = Phrase.registeredPhrases
+        componentIDs = tuple(sys.intern(id) for id in componentIDs) #Interned like registered ids, so registry lookups compare by identity
+        key = ("sequential", mainID.lower(), componentIDs, position)
+        existing = Phrase.createdPhrases.get(key)
+        reusable = not aliases and (soundBite is None or soundBite == "Fetch") #New aliases or a new sound bite must be applied, so the phrase is rebuilt
+        if register and reusable and existing is not None and registeredPhrases.get(existing.ids[0]) is existing:
+            return existing #The same phrase was already built and is still registered
+        missing = set(componentIDs).difference(registeredPhrases) #Check every component in one set operation
+        assert not missing, "Must register component phrases first. Unregistered: " + str(sorted(missing))
+        components = [registeredPhrases[id] for id in componentIDs] #Look up each component once
+        syllables = sum(component.syllables for component in components)
+        info = "Play the following phrases in succession:" + "".join("\n" + str(i) + ")" + component.info for i, component in enumerate(components))
+
+        x = Phrase(mainID = mainID, syllables = syllables, position = position, info = info, aliases = aliases, soundBite = soundBite or "Fetch", register = register)
+        x.fetchArguments = (x.ids[0], "sequential", componentIDs) #If no sound bite was given, synthesize it from the components when first needed
         if register:
-            assert mainID in Phrase.registeredPhrases, "Registering sequential phrase failed."
+            assert mainID in registeredPhrases, "Registering sequential phrase failed."
+            Phrase.createdPhrases[key] = x
         return x
 
 class CompositionGenerator():
     #Class that provides a static method to generate a composition
     #Uses standard BolParser symbols (user can modify later)
+    MODEL = "meta-llama/Meta-Llama-3-70B-Instruct"
+    DRAFT_MODEL = "meta-llama/Meta-Llama-3-8B-Instruct"
+    pipelines = {} #Loaded text generation pipelines, keyed by model and token, so weights are only loaded once per session
+    draftModels = {} #Loaded draft models for speculative decoding, keyed by model and token
+    engines = {} #Loaded vLLM engines, keyed by model and token
+
+    @classmethod
+    def getPipeline(cls, model:str, token:str, quantization:str = "fp16"):
+        '''
+        Returns the text generation pipeline for the given model, loading it only on first use
+
+        Parameters:
+            model(str): The HuggingFace identifier of the model
+            token(str): The HuggingFace token for the user's access to the model
+            quantization(str): The precision of the model weights, one of "fp16", "bf16", "int8", or "int4". The latter two require the bitsandbytes package. By default, "fp16"
+        '''
+        key = (model, token, quantization)
+        if key not in CompositionGenerator.pipelines:
+            #Imported here since torch and transformers are slow to import and only needed for composition generation
+            import torch
+            from transformers import pipeline, BitsAndBytesConfig
+            dtype = torch.bfloat16 if quantization == "bf16" else torch.float16 #bfloat16 keeps float32's range, which avoids overflow on GPUs that support it
+            if quantization in ("fp16", "bf16"):
+                modelArguments = {}
+            elif quantization == "int8":
+                modelArguments = {"quantization_config": BitsAndBytesConfig(load_in_8bit = True)}
+            elif quantization == "int4":
+                modelArguments = {"quantization_config": BitsAndBytesConfig(load_in_4bit = True, bnb_4bit_compute_dtype = dtype)}
+            else:
+                raise ValueError("Invalid quantization passed. Must be one of fp16, bf16, int8, or int4.")
+            pipe = pipeline("text-generation", model = model, token = token, torch_dtype = dtype, device_map = "auto", model_kwargs = modelArguments)
+            #Llama has no padding token, so pad batched prompts on the left with the end of sequence token
+            pipe.tokenizer.pad_token_id = pipe.tokenizer.eos_token_id
+            pipe.tokenizer.padding_side = "left"
+            CompositionGenerator.pipelines[key] = pipe
+        return CompositionGenerator.pipelines[key]
+
+    @classmethod
+    def getDraftModel(cls, model:str, token:str):
+        '''
+        Returns the small model used to propose tokens during speculative decoding, loading it only on first use
+
+        Parameters:
+            model(str): The HuggingFace identifier of the draft model. It must share a tokenizer with the main model
+            token(str): The HuggingFace token for the user's access to the model
+        '''
+        key = (model, token)
+        if key not in CompositionGenerator.draftModels:
+            import torch
+            from transformers import AutoModelForCausalLM
+            CompositionGenerator.draftModels[key] = AutoModelForCausalLM.from_pretrained(model, token = token, torch_dtype = torch.float16, device_map = "auto")
+        return CompositionGenerator.draftModels[key]
+
+    @classmethod
+    def getEngine(cls, model:str, token:str):
+        '''
+        Returns the vLLM engine for the given model, loading it only on first use. vLLM's paged KV cache and continuous batching give much higher throughput than the transformers pipeline when many compositions are requested
+
+        Parameters:
+            model(str): The HuggingFace identifier of the model
+            token(str): The HuggingFace token for the user's access to the model
+        '''
+        key = (model, token)
+        if key not in CompositionGenerator.engines:
+            import torch
+            from vllm import LLM #Optional dependency, only needed for the vllm backend
+            previousToken = os.environ.get("HF_TOKEN")
+            os.environ["HF_TOKEN"] = token #vLLM reads the HuggingFace token from the environment, so it is only set while the engine loads
+            try:
+                CompositionGenerator.engines[key] = LLM(model = model, dtype = "float16", tensor_parallel_size = max(torch.cuda.device_count(), 1))
+            finally:
+                if previousToken is None:
+                    os.environ.pop("HF_TOKEN", None)
+                else:
+                    os.environ["HF_TOKEN"] = previousToken
+        return CompositionGenerator.engines[key]
+
     @classmethod
-    def generate(cls, type:str, taal:Union[str, int], speedClass: str, jati: Union[str, int], school: str, token: str):
+    def generate(cls, type:str, taal:Union[str, int], speedClass: str, jati: Union[str, int], school: str, token: str, numCompositions:int = 1, batchSize:int = 1, quantization:str = "fp16", draftModel:Union[str, None] = None, backend:str = "transformers"):
         '''
         A method that generates a composition given parameters using the Llama model available on HuggingFace
 
@@ -535,9 +854,23 @@ class CompositionGenerator():
             jati(Union[str, int]): The jati of the composition, or the number of syllables per beat. Ex. Chatusra or 4, Tisra or 3
             school(str): The style of playing. Ex. Lucknow, Delhi, Ajrada, Punjabi, etc.
             token(str): The HuggingFace token for the user's access to Llama.
+            numCompositions(int): The number of compositions to generate. By default, 1
+            batchSize(int): How many compositions to generate together in one forward pass. By default, 1
+            quantization(str): The precision of the model weights, one of "fp16", "bf16", "int8", or "int4". Quantized weights need less GPU memory and decode faster, but require the bitsandbytes package. By default, "fp16"
+            draftModel(str or None): A smaller model sharing Llama's tokenizer (Ex. CompositionGenerator.DRAFT_MODEL) that proposes tokens for the main model to verify, speeding up generation. Requires a batchSize of 1. By default, None
+            backend(str): The inference library to use, either "transformers" or "vllm". The vllm backend batches all requested compositions itself, ignoring batchSize, and requires the vllm package. By default, "transformers"
+
+        Returns:
+            composition(str) OR compositions(list[str]): The generated composition, or a list of them if more than one was requested
         '''
         warnings.warn("This is an experimental feature that may provide incorrect or incomplete results.")
         warnings.warn("Execution time might be excessive depending on your hardware.")
+        if backend not in ("transformers", "vllm"):
+            raise ValueError("Invalid backend passed. Must be one of transformers or vllm.")
+        if backend == "vllm" and (draftModel or quantization != "fp16"):
+            raise ValueError("The vllm backend does not support draft models or quantization.")
+        if draftModel and batchSize != 1:
+            raise ValueError("Speculative decoding with a draft model only supports a batchSize of 1.")
         TEMPLATE = '''
         {
         "composition": "Kayda",
@@ -562,7 +895,7 @@ class CompositionGenerator():
         "display": "Bhatkande"
         }
         '''
-        phraseInfo = "The following phrases are defined by the user on the tabla, along with a description of how to play them: \n" + "\n".join([key + "." + val.description for key, val in Phrase.registeredPhrases.items()])
+        phraseInfo = "The following phrases are defined by the user on the tabla, along with a description of how to play them: \n" + Phrase.getRegisteredDescriptions()
         mainPrompt = "Using the above phrases only, compose a " + type + " in taal with name/beats " + taal + " and speed class " + speedClass + ". The composition should be in jati with name/syllables per beat " + jati + " and in the " + school + " style of playing. Components of the composition should be marked appropriately."
         symbolPrompt = "Each beat should be separated with the character '|'. An example of the expected output if the user requests a Kayda of Ektaal, with Chatusra Jati, in the Lucknow Gharana is: \n" + TEMPLATE + "\n A phrase cannot span more than one beat. A phrase can also span exactly one syllable even if it usually spans more than one. In that case, enclose the phrase with parentheses."
         end = "Finally, in addition to following the above rules, the composition should be as authentic and aesthetically pleasing as possible."
@@ -570,11 +903,23 @@ class CompositionGenerator():
         messages = [
             {"role": "user", "content": prompt},
         ]
-        pipe = pipeline("text-generation", model="meta-llama/Meta-Llama-3-70B-Instruct", token = token, torch_dtype=torch.float16, device_map="auto")
-        return pipe(messages, do_sample = True, num_return_sequences = 1, eos_token_id = pipe.tokenizer.eos_token_id, return_full_text = False)[0]['generated_text']
+        if backend == "vllm":
+            from vllm import SamplingParams
+            engine = CompositionGenerator.getEngine(CompositionGenerator.MODEL, token)
+            outputs = engine.chat([messages] * numCompositions, SamplingParams(temperature = 1.0, max_tokens = 4096))
+            compositions = [output.outputs[0].text for output in outputs]
+        else:
+            pipe = CompositionGenerator.getPipeline(CompositionGenerator.MODEL, token, quantization)
+            generationArguments = {"assistant_model": CompositionGenerator.getDraftModel(draftModel, token)} if draftModel else {}
+            outputs = pipe([messages] * numCompositions, batch_size = batchSize, **generationArguments, do_sample = True, num_return_sequences = 1, eos_token_id = pipe.tokenizer.eos_token_id, pad_token_id = pipe.tokenizer.eos_token_id, return_full_text = False)
+            compositions = [output[0]['generated_text'] for output in outputs]
+        return compositions[0] if numCompositions == 1 else compositions
 
 class AudioToBolConvertor():
     #Class that provides a static method to transcribe a bol given the recording of a composition
+    FINGERPRINT_CACHE = ".tabalchi_fingerprints.json" #Where reference fingerprints are saved between sessions. Named for this package so no other file is overwritten, and kept out of recordings/, which is filled from Github
+    referenceFingerprints = None #The modification time and fingerprint of known recordings, keyed by file name. Loaded from FINGERPRINT_CACHE on first use
+    referenceFingerprintsChanged = False #Whether referenceFingerprints has entries not yet saved to FINGERPRINT_CACHE
     @classmethod
     def convert(cls, recording:str, speed:int, jati:int) -> str:
         '''
@@ -589,6 +934,7 @@ class AudioToBolConvertor():
             bolString(str): THe transcription of the audio
         '''
         warnings.warn("This is an experimental feature that may provide incorrect or incomplete results.")
+        import audio_effects as ae #Imported here since it is only needed for slowing down sounds
         currentSyllableDuration = 60.0/(speed*jati)
         desiredSyllableDuration = 0.25
         sound = AudioSegment.from_file(recording)
@@ -597,51 +943,109 @@ class AudioToBolConvertor():
         elif currentSyllableDuration < desiredSyllableDuration:
             sound = ae.speed_down(sound, currentSyllableDuration / desiredSyllableDuration)
         #Now, parse the audio for every 0.25 second snippet, comparing it with known recordings
-        recordings = {val.soundBite.recording: key for key, val in Phrase.registeredPhrases}
-        bolString = ""
+        recordings = {val.soundBite.recording: key for key, val in Phrase.registeredPhrases.items()}
+        references = {phrase: AudioToBolConvertor.getReferenceFingerprint(recording) for recording, phrase in recordings.items()} #Fingerprint every known recording once, not once per snippet
+        AudioToBolConvertor.saveReferenceFingerprints()
+        phrases = [] #Collect the transcribed phrases and join them once at the end
         marker = 0
         while (marker < sound.duration_seconds * 1000):
-            add = AudiotoBolConvertor.getMostSimilarSound(snippet = sound[marker: marker + 250], source = recordings)
+            add = AudioToBolConvertor.getMostSimilarSound(snippet = sound[marker: marker + 250], references = references)
             marker += Phrase.registeredPhrases[add].syllables * 250
-            bolString += add
-        return bolString
+            phrases.append(add)
+        return " ".join(phrases)
 
     @classmethod
-    def getMostSimilarSound(cls, snippet, source:Dict[str, str]) -> str:
+    def fingerprint(cls, audio:Union[str, AudioSegment]) -> np.ndarray:
         '''
-        A method that gets the most similar sounding bol to a given audio
+        A method that computes the chromaprint fingerprint of some audio
 
         Parameters:
-            snippet: The audio snippet to identify/transcribe
-            from(dict<str, str>): The known vocabulary to choose from
+            audio(str or AudioSegment): The filename of an audio file, or audio that is already decoded
+
+        Returns:
+            fingerprint(np.ndarray): The decoded fingerprint, as an array of 32-bit words
         '''
-        snippet.export("snippetTemp", format = "m4a")
-        _, encoded = acoustid.fingerprint_file("snippetTemp")
+        #Imported here since fingerprinting is only needed for transcription
+        import acoustid
+        import chromaprint
+        if isinstance(audio, str):
+            _, encoded = acoustid.fingerprint_file(audio)
+        else: #Fingerprint the samples directly, without a round trip through a file
+            audio = audio.set_sample_width(2) #Chromaprint reads 16-bit samples
+            encoded = acoustid.fingerprint(audio.frame_rate, audio.channels, [audio.raw_data])
         fingerprint, _ = chromaprint.decode_fingerprint(
             encoded
         )
-        references = {}
-        for key, val in source.items():
-            _, e = acoustid.fingerprint_file(key)
-            f, _ = chromaprint.decode_fingerprint(
-                e
-            )
-            references[val] = f
-
-        from operator import xor
+        return np.asarray(fingerprint, dtype = np.int64).astype(np.uint32) #Decoded words may be signed, so reinterpret them as unsigned 32-bit
+
+    @classmethod
+    def getReferenceFingerprint(cls, recording:str) -> np.ndarray:
+        '''
+        A method that gets the fingerprint of a known recording, computing it only if the recording is new or has changed since it was last fingerprinted
+
+        Parameters:
+            recording(str): The filename of the recording
+
+        Returns:
+            fingerprint(np.ndarray): The decoded fingerprint, as an array of 32-bit words
+        '''
+        Fetcher.fetchRecordings()
+        if AudioToBolConvertor.referenceFingerprints is None:
+            AudioToBolConvertor.loadReferenceFingerprints()
+        modified = os.path.getmtime(recording)
+        cached = AudioToBolConvertor.referenceFingerprints.get(recording)
+        if cached is None or cached[0] != modified:
+            cached = (modified, AudioToBolConvertor.fingerprint(recording))
+            AudioToBolConvertor.referenceFingerprints[recording] = cached
+            AudioToBolConvertor.referenceFingerprintsChanged = True
+        return cached[1]
+
+    @classmethod
+    def loadReferenceFingerprints(cls):
+        '''
+        A method that loads the reference fingerprints saved by an earlier session, if any
+        '''
+        try:
+            with open(AudioToBolConvertor.FINGERPRINT_CACHE, "r") as file:
+                saved = json.load(file) #Plain JSON, so loading a cache can never run code
+            AudioToBolConvertor.referenceFingerprints = {recording: (float(modified), np.asarray(fingerprint, dtype = np.uint32)) for recording, (modified, fingerprint) in saved.items()}
+        except (OSError, ValueError, TypeError, AttributeError): #No usable cache, so start from scratch
+            AudioToBolConvertor.referenceFingerprints = {}
+
+    @classmethod
+    def saveReferenceFingerprints(cls):
+        '''
+        A method that saves the reference fingerprints for later sessions, if any were computed since the last save
+        '''
+        if not AudioToBolConvertor.referenceFingerprintsChanged:
+            return
+        with open(AudioToBolConvertor.FINGERPRINT_CACHE + ".tmp", "w") as file:
+            json.dump({recording: (modified, fingerprint.tolist()) for recording, (modified, fingerprint) in AudioToBolConvertor.referenceFingerprints.items()}, file)
+        os.replace(AudioToBolConvertor.FINGERPRINT_CACHE + ".tmp", AudioToBolConvertor.FINGERPRINT_CACHE) #Never leave a half-written cache behind
+        AudioToBolConvertor.referenceFingerprintsChanged = False
+
+    @classmethod
+    def getMostSimilarSound(cls, snippet, references:Dict[str, np.ndarray]) -> str:
+        '''
+        A method that gets the most similar sounding bol to a given audio
+
+        Parameters:
+            snippet(AudioSegment): The audio snippet to identify/transcribe
+            references(dict<str, np.ndarray>): The known vocabulary to choose from, mapping each phrase to the fingerprint of its recording
+        '''
+        fingerprint = AudioToBolConvertor.fingerprint(snippet)
+
         maxSimilarity = 0
         mostSimilarPhrase = None
-        for phrase, print in references.items():
-            max_hamming_weight = 32 * min(len(fingerprint), len(print))
-            hamming_weight = sum(
-                sum(
-                    c == "1"
-                    for c in bin(xor(fingerprint[i], print[i]))
-                )
-                for i in range(min(len(fingerprint), len(print)))
-            )
-            if (hamming_weight / max_hamming_weight) > maxSimilarity:
-                maxSimilarity = hamming_weight / max_hamming_weight
+        for phrase, reference in references.items():
+            length = min(len(fingerprint), len(reference))
+            if length == 0:
+                continue
+            #Count the differing bits of the overlapping words all at once
+            hammingWeight = np.unpackbits(np.bitwise_xor(fingerprint[:length], reference[:length]).view(np.uint8)).sum()
+            similarity = 1 - hammingWeight / (32 * length) #Fewer differing bits means more similar
+            if similarity > maxSimilarity:
+                maxSimilarity = similarity
                 mostSimilarPhrase = phrase
         return mostSimilarPhrase
 
@@ -673,20 +1077,8 @@ expansionarySchema = {
 
 
 def expansionaryAssembler(tablaFile:SimpleNamespace) -> list[str]:
-    result = []
-    result.append(tablaFile.mainTheme.bhari)
-    if tablaFile.mainTheme.khali == "Infer":
-        result.append(BolParser.toKhali(tablaFile.mainTheme.bhari))
-    else:
-        result.append(tablaFile.mainTheme.khali)
-
-    for palta in tablaFile.paltas:
-        result.append(palta.bhari)
-        if palta.khali == "Infer":
-            result.append(BolParser.toKhali(palta.bhari))
-        else:
-            result.append(palta.khali)
-
+    themes = [tablaFile.mainTheme, *tablaFile.paltas] #The main theme and each palta contribute a bhari and a khali
+    result = [segment for theme in themes for segment in (theme.bhari, BolParser.toKhali(theme.bhari) if theme.khali == "Infer" else theme.khali)]
     result.append(tablaFile.tihai)
     return result
 
@@ -703,8 +1095,9 @@ fixedSchema = {
 def fixedAssembler(tablaFile:SimpleNamespace) -> list[str]:
     result = []
     result.append(tablaFile.content)
-    if hasattr(tablaFile, tihai):
-        result.append(tablaFile.tihai)
+    tihai = getattr(tablaFile, "tihai", None) #The tihai is optional for fixed compositions
+    if tihai is not None:
+        result.append(tihai)
 
     return result
 
@@ -747,11 +1140,15 @@ def regularFixedValidityCheck(bol:Bol) -> bool:
     return True
 
 
+def getPhraseList(bol:Bol) -> list[Phrase]:
+    return [phrase for beat in bol.beats for phrase, _ in beat.phrases] #Every phrase of the bol, in order
+
 def regularChakradarValidityCheck(bol:Bol) -> bool:
-    phraseList = [phrase for phrase in bol.beats.phrases.keys()]
+    phraseList = getPhraseList(bol)
     k, m = divmod(len(phraseList), 3)
-    cycles = (phraseList[i*k+min(i, m):(i+1)*k+min(i+1, m)] for i in range(3))
-    return len(phraseList) % 3 and set(cycles[0]) == set(cycles[1]) and set(cycles[1]) == set(cycles[2])
+    if m: #The composition must split into three equal cycles
+        return False
+    return set(phraseList[:k]) == set(phraseList[k:2*k]) == set(phraseList[2*k:])
 
 def specialChakradarValidityCheck(bol:Bol) -> bool:
     return regularChakradarValidityCheck(bol) and all([beat.saam for beat in bol.markedBeats])
@@ -760,19 +1157,19 @@ def regularTihaiValidityCheck(bol:Bol) -> bool:
     return regularChakradarValidityCheck(bol)
 
 def bedamTihaiValidityCheck(bol:Bol) -> bool:
-    phraseList = [phrase for phrase in bol.beats.phrases.keys()]
-    return regularTihaiValidityCheck(bol) and all(["S" not in phrase.ids for phrase in phraseList])
+    return regularTihaiValidityCheck(bol) and all("s" not in phrase.ids for phrase in getPhraseList(bol)) #Phrase ids are lowercase
 
 def damdarTihaiValidityCheck(bol:Bol) -> bool:
-    phraseList = [phrase for phrase in bol.beats.phrases.keys()]
-    return regularTihaiValidityCheck(bol) and any(["S" in phrase.ids for phrase in phraseList])
+    return regularTihaiValidityCheck(bol) and any("s" in phrase.ids for phrase in getPhraseList(bol))
 
 def toRecursiveNamespace(d):
     x = SimpleNamespace()
-    _ = [setattr(x, k,
-                 toRecursiveNamespace(v) if isinstance(v, dict)
-                 else [toRecursiveNamespace(e) for e in v] if isinstance(v, list)
-                 else v) for k, v in d.items()]
+    for k, v in d.items():
+        if isinstance(v, dict):
+            v = toRecursiveNamespace(v)
+        elif isinstance(v, list):
+            v = [toRecursiveNamespace(e) if isinstance(e, dict) else e for e in v]
+        setattr(x, k, v)
     return x
 
 class BolParser():
@@ -784,6 +1181,11 @@ class BolParser():
     PHRASE_JOINER_OPEN = "["
     PHRASE_JOINER_CLOSE = "]"
     MARKER = "~"
+    BEAT_TOKENIZER = re.compile(re.escape(PHRASE_JOINER_OPEN) + "[^" + re.escape(PHRASE_JOINER_CLOSE) + "]*" + re.escape(PHRASE_JOINER_CLOSE) + r"|\S+") #A whole [] grouping or a single phrase
+    PHRASE_KEY_TABLE = str.maketrans("", "", PHRASE_SPLITTER + MARKER) #Strips a token down to the name of its phrase
+    JOINER_TABLE = str.maketrans("", "", PHRASE_JOINER_OPEN + PHRASE_JOINER_CLOSE) #Strips the brackets from a [] grouping
+    console = None #The rich console and rendered symbol rules, created the first time the rules are shown
+    symbolRules = None
 
     SYMBOLSMD = '''
     <table>
@@ -821,12 +1223,6 @@ class BolParser():
     </table>
     '''
 
-    #Download recordings folder if it does not exist already
-    destination = Path.cwd() / "recordings"
-    destination.mkdir(exist_ok=True, parents=True)
-    fs = fsspec.filesystem("github", org="shreyanmitra", repo="Tabalchi")
-    fs.get(fs.ls("recordings/"), destination.as_posix(), recursive=True)
-
     #Register bhari-khali mappings, basic vocab, composite phrases, compositions, jatis, sequences, speeds, and taals
     vocabInitializer = [('ge', 1, 'baiyan', 'Use the index and middle fingers to strike the narrow part of the maidan above the shyahi', ['ga', 'ghet', 'gat'], Sound("ge", "Ge.m4a"), True),
     ('ke', 1, 'baiyan', 'With a flat palm, lift the front fingers and lay them down again on the maidan above the shyahi', ['ki', 'ka'], Sound("ke", "Ke.m4a"), True),
@@ -864,9 +1260,9 @@ class BolParser():
     for element in sequentialInitializer:
         Phrase.createSequentialPhrase(*element)
 
-    speedInitializer = [(lambda x: x <=60, random.randint(0, 60), "Vilambit"),
-    (lambda x: x>60 and x<=120, random.randint(60,120), "Madhya"),
-    (lambda x: x>120, random.randint(120,300), "Drut")
+    speedInitializer = [(lambda x: x <=60, lambda: random.randint(0, 60), "Vilambit"), #A new bpm is sampled every time a speed class is used by name
+    (lambda x: x>60 and x<=120, lambda: random.randint(60,120), "Madhya"),
+    (lambda x: x>120, lambda: random.randint(120,300), "Drut")
     ]
     for element in speedInitializer:
         SpeedClasses(*element)
@@ -879,6 +1275,9 @@ class BolParser():
     Phrase.registeredPhrases["dheredhere"] : Phrase.registeredPhrases["teretere"],
     Phrase.registeredPhrases["gran"] : Phrase.registeredPhrases["kran"]
     }
+    khaliTable = None #Every name of a bhari phrase, mapped to its khali phrase. Built from bhariKhaliMappings, and rebuilt whenever it is edited
+    khaliPattern = None #Any whole bhari phrase, longest names first
+    khaliMappingsUsed = None #The bhariKhaliMappings khaliTable was built from
 
     taalInitializer = [{'beats':3, 'name':'Sadanand', 'taali':[1], 'khali':[]},
     {'beats':6, 'name':'Carnatic Rupaak', 'taali':[1,3], 'khali':[]},
@@ -1016,165 +1415,148 @@ class BolParser():
 
     @classmethod
     def toKhali(cls, bolString:str) -> str:
-        result = bolString
-        for key, val in BolParser.bhariKhaliMappings.items():
-            for id in key.ids:
-                result = result.replace(id, val.ids[0])
-        return result
+        if BolParser.khaliMappingsUsed != BolParser.bhariKhaliMappings: #The mappings are editable through getBhariKhaliMappings
+            BolParser.buildKhaliTable()
+        return BolParser.convertToKhali(bolString)
+
+    @classmethod
+    def buildKhaliTable(cls):
+        '''
+        Builds the table and pattern toKhali uses from the current bhariKhaliMappings, and forgets conversions made with the old ones
+        '''
+        BolParser.khaliMappingsUsed = dict(BolParser.bhariKhaliMappings)
+        BolParser.khaliTable = {id: val.ids[0] for key, val in BolParser.khaliMappingsUsed.items() for id in key.ids}
+        BolParser.khaliPattern = re.compile(r"(?<![A-Za-z])(?:" + "|".join(sorted(map(re.escape, BolParser.khaliTable), key = len, reverse = True)) + r")(?![A-Za-z])")
+        BolParser.convertToKhali.cache_clear()
+
+    @classmethod
+    @lru_cache(maxsize = 2048) #The same bhari strings, such as thekas, recur across compositions. Cleared whenever the table is rebuilt
+    def convertToKhali(cls, bolString:str) -> str:
+        return BolParser.khaliPattern.sub(lambda match: BolParser.khaliTable[match.group(0)], bolString) #Replace all bhari phrases in one pass
 
 
     @classmethod
     def parse(cls, file) -> Bol:
-        assert ".tabla" in file, "Please pass a valid .tabla file"
+        assert os.fspath(file).endswith(".tabla"), "Please pass a valid .tabla file"
         with open(file, 'r') as composition:
             rawData = json.load(composition)
             data = SimpleNamespace(**rawData)
         try:
             compositionType = CompositionType.registeredTypes[data.type]
             taal = Taal.registeredTaals[data.taal]
-            speed = {}
             if isinstance(data.speed, dict):
-                for key, val in data.speed.items():
-                    speed.update({BeatRange.fromString(key): Speed(val)})
+                speed = BeatRangeMap({BeatRange.fromString(key): Speed(val) for key, val in data.speed.items()})
             else:
                 speed = Speed(data.speed)
-            jati = {}
             if isinstance(data.jati, dict):
-                for key, val in data.speed.items():
-                    jati.update({BeatRange.fromString(key): Jati.registeredJatis[val]})
+                jati = BeatRangeMap({BeatRange.fromString(key): Jati.registeredJatis[val] for key, val in data.jati.items()})
             elif isinstance(data.jati, str) and data.jati != "Infer":
                 jati = Jati.registeredJatis[data.jati]
             else:
                 jati = data.jati
             playingStyle = data.playingStyle
             assert data.display in Notation.VALID_NOTATIONS
-            display = eval(data.display)
-            assert compositionType.preCheck(data.components)
-        except Exception:
-            raise ValueError("Something is wrong with the configuration of your .tabla file")
-
-        data = toRecursiveNamespace(rawData)
-        segmentList = compositionType.assembler(data.components)
-        if(any([(segment.count(BolParser.BEAT_DIVIDER) + 1) % taal.beats != 0 for segment in segmentList])):
+            display = Notation.VALID_NOTATIONS[data.display]
+            compositionType.validate(data.components) #Raises with the reason if the components do not match the composition type's schema
+        except Exception as e:
+            raise ValueError("Something is wrong with the configuration of your .tabla file") from e
+
+        segmentList = compositionType.assembler(toRecursiveNamespace(data.components)) #Only the components need dot access at any depth
+        if any((segment.count(BolParser.BEAT_DIVIDER) + 1) % taal.beats != 0 for segment in segmentList): #Stops at the first misaligned segment
             warnings.warn("Specific segments of your composition do not align with the selected taal. This may or may not be a problem, depending on the type of composition. The program will continue without error as long as the entire composition as a whole aligns in number of beats with the taal.")
-        completeBolString = BolParser.BEAT_DIVIDER.join(segmentList)
-        completeBolStringFormatted = completeBolString.split(BolParser.BEAT_DIVIDER)
-        for index in range(len(completeBolStringFormatted)):
-            if (index+1) % taal.beats == 1:
-                completeBolStringFormatted[index] = '\n\n\033[1m' + completeBolStringFormatted[index] + '\033[0m'
-        completeBolStringFormatted = BolParser.BEAT_DIVIDER.join(completeBolStringFormatted)
-        assert (completeBolString.count(BolParser.BEAT_DIVIDER) + 1) % taal.beats == 0, "Taal not compatible with composition. The composition: \n" + completeBolStringFormatted + "\n\n has " + str(completeBolString.count(BolParser.BEAT_DIVIDER) + 1) + " beats, which is not a multiple of " + str(taal.beats) + "."
-        totalBeats = completeBolString.count(BolParser.BEAT_DIVIDER) + 1
-        beatPartition = completeBolString.split(BolParser.BEAT_DIVIDER)
-        if isinstance(speed, dict):
-            assert BeatRange.isContiguousSequence(list(speed.keys()), totalBeats)
-        if isinstance(jati, dict):
-            assert BeatRange.isContiguousSequence(list(jati.keys()), totalBeats)
+        beatPartition = BolParser.BEAT_DIVIDER.join(segmentList).split(BolParser.BEAT_DIVIDER)
+        totalBeats = len(beatPartition)
+        beats = taal.beats
+        #The formatted composition is only built if the assertion fails
+        assert totalBeats % beats == 0, "Taal not compatible with composition. The composition: \n" + BolParser.BEAT_DIVIDER.join('\n\n\033[1m' + beat + '\033[0m' if (index+1) % beats == 1 else beat for index, beat in enumerate(beatPartition)) + "\n\n has " + str(totalBeats) + " beats, which is not a multiple of " + str(beats) + "."
+        if isinstance(speed, BeatRangeMap):
+            assert BeatRange.isContiguousSequence(speed.ranges(), totalBeats)
+        if isinstance(jati, BeatRangeMap):
+            assert BeatRange.isContiguousSequence(jati.ranges(), totalBeats)
 
         def inferJati(beat:str) -> int:
             beat = beat.strip()
-            newStr = ""
+            newStr = [] #Collect the characters and join them once at the end
             inGrouping = False
             for char in beat:
                 if char == BolParser.PHRASE_JOINER_OPEN:
                     inGrouping = True
-                if char == BolParser.PHRASE_JOINER_OPEN:
-                    inGrouping =  False
+                elif char == BolParser.PHRASE_JOINER_CLOSE:
+                    inGrouping = False
 
                 if char == " " and inGrouping:
-                    newStr += "*"
+                    newStr.append("*")
                 elif char == BolParser.PHRASE_SPLITTER:
-                    newStr += " "
+                    newStr.append(" ")
                 else:
-                    newStr += char
+                    newStr.append(char)
 
-            return len(newStr.split(" "))
+            return len("".join(newStr).split(" "))
 
 
-        def getJati(beatNumber:int) -> int:
-            if isinstance(jati, Jati):
-                return jati.syllables
-            elif isinstance(jati, dict):
-                for beatInterval in jati.keys():
-                    if beatNumber >= beatInterval.begin and beatNumber < beatInterval.end:
-                        return jati[beatInterval].syllables
-            else:
-                return -1 #Control flow should never end up here
-
-        def getSpeed(beatNumber:int) -> int:
-            if isinstance(speed, Speed):
-                return speed.bpm
-            elif isinstance(speed, dict):
-                for beatInterval in speed.keys():
-                    if beatNumber >= beatInterval.begin and beatNumber < beatInterval.end:
-                        return speed[beatInterval].bpm
-            else:
-                return -1 #Control flow should never end up here
+        #The jati and speed of every beat, found once up front instead of looked up for each beat
+        if isinstance(jati, Jati):
+            beatJatis = [jati.syllables] * totalBeats
+        elif isinstance(jati, BeatRangeMap):
+            beatJatis = [value.syllables for value in jati.expand(totalBeats)]
+        else:
+            beatJatis = [-1] * totalBeats #The jati is inferred, so it is never checked
+        checkJati = jati != "Infer" #Decided once for the whole composition rather than for every beat
+        if isinstance(speed, Speed):
+            beatSpeeds = [speed.bpm] * totalBeats
+        else:
+            beatSpeeds = [value.bpm for value in speed.expand(totalBeats)]
 
+        phrases = Phrase.registeredPhrases #Bound once, since it is looked up for every token
+        taali, khali = frozenset(taal.taali), frozenset(taal.khali) #Checked for every beat
         finalizedBeats = []
         for i in range (len(beatPartition)):
             beat = beatPartition[i]
-            #assert jati == "Infer" or inferJati(beat) == getJati(i + 1), "Provided jati for certain beats does not match actual jati at beat " + str(i) + ". User-specified jati: " + str(getJati(i+1)) + " syllables per beat, while actual jati seems to be " + str(inferJati(beat)) + " syllables per beat. The bols in the beat are: " + beat + "."
+            #assert jati == "Infer" or inferJati(beat) == beatJatis[i], "Provided jati for certain beats does not match actual jati at beat " + str(i) + ". User-specified jati: " + str(beatJatis[i]) + " syllables per beat, while actual jati seems to be " + str(inferJati(beat)) + " syllables per beat. The bols in the beat are: " + beat + "."
             beat = beat.strip()
-            newStr = ""
-            inGrouping = False
-            for char in beat:
-                if char == BolParser.PHRASE_JOINER_OPEN:
-                    inGrouping = True
-                if char == BolParser.PHRASE_JOINER_OPEN:
-                    inGrouping =  False
-
-                if char == " " and inGrouping:
-                    newStr += "*"
-                else:
-                    newStr += char
-
-            intermediate = newStr.split(" ")
-            markers = []
-            rawPhrases = []
-            syllableCount = []
+            intermediate = BolParser.BEAT_TOKENIZER.findall(beat)
+            markers = bytearray() #One byte per phrase, 1 if the phrase is marked with ~
+            phraseSyllableMapping = [] #Each phrase of the beat, alongside the number of syllables it takes up
+            totalSyllables = 0 #Accumulated alongside phraseSyllableMapping, so the jati check does not traverse it again
 
             for elem in intermediate:
                 if(not elem.startswith(BolParser.PHRASE_JOINER_OPEN)):
-                    if(elem.startswith(BolParser.MARKER)):
-                        markers.append(1)
-                    else:
-                        markers.append(0)
-                    correspondingPhrase = Phrase.registeredPhrases[elem.replace(BolParser.PHRASE_SPLITTER, "").replace(BolParser.MARKER, "")]
-                    rawPhrases.append(correspondingPhrase)
-                    if elem.count(BolParser.PHRASE_SPLITTER) != 0:
-                        syllableCount.append(elem.count(BolParser.PHRASE_SPLITTER) + 1)
+                    markers.append(elem.startswith(BolParser.MARKER))
+                    correspondingPhrase = phrases[elem.translate(BolParser.PHRASE_KEY_TABLE)]
+                    splitters = elem.count(BolParser.PHRASE_SPLITTER) #Counted once, since it is both tested and used
+                    if splitters != 0:
+                        syllables = splitters + 1
                     else:
-                        syllableCount.append(correspondingPhrase.syllables)
+                        syllables = correspondingPhrase.syllables
+                    phraseSyllableMapping.append((correspondingPhrase, syllables))
+                    totalSyllables += syllables
                 else:
-                    deconstructed = (elem.replace(BolParser.PHRASE_JOINER_OPEN, "").replace(BolParser.PHRASE_JOINER_CLOSE, "")).split("*")
+                    deconstructed = elem.translate(BolParser.JOINER_TABLE).split()
+                    groupSize = len(deconstructed) #The phrases in a grouping share the space of one syllable
                     for subElem in deconstructed:
-                        if(subElem.startswith(BolParser.MARKER)):
-                            markers.append(1)
+                        markers.append(subElem.startswith(BolParser.MARKER))
+                        correspondingPhrase = phrases[subElem.translate(BolParser.PHRASE_KEY_TABLE)]
+                        splitters = subElem.count(BolParser.PHRASE_SPLITTER)
+                        if splitters != 0:
+                            syllables = (splitters + 1) / groupSize
                         else:
-                            markers.append(0)
-                        correspondingPhrase = Phrase.registeredPhrases[subElem.replace(BolParser.PHRASE_SPLITTER, "").replace(BolParser.MARKER, "")]
-                        rawPhrases.append(correspondingPhrase)
-                        if subElem.count(BolParser.PHRASE_SPLITTER) != 0:
-                            syllableCount.append((subElem.count(BolParser.PHRASE_SPLITTER) + 1) / len(deconstructed))
-                        else:
-                            syllableCount.append((correspondingPhrase.syllables) / len(deconstructed))
+                            syllables = correspondingPhrase.syllables / groupSize
+                        phraseSyllableMapping.append((correspondingPhrase, syllables))
+                        totalSyllables += syllables
 
-            assert jati == "Infer" or sum(syllableCount) == getJati(i + 1), "Provided jati for certain beats does not match actual jati at beat " + str(i) + ". User-specified jati: " + str(getJati(i+1)) + " syllables per beat, while actual jati seems to be " + str(sum(syllableCount)) + " syllables per beat. The bols in the beat are: " + beat + "."
+            assert not checkJati or math.isclose(totalSyllables, beatJatis[i]), "Provided jati for certain beats does not match actual jati at beat " + str(i) + ". User-specified jati: " + str(beatJatis[i]) + " syllables per beat, while actual jati seems to be " + str(totalSyllables) + " syllables per beat. The bols in the beat are: " + beat + "."
+            position = (i + 1) % beats #Where this beat falls within its cycle of the taal
             taaliKhaliOrNone = 0
-            if (i + 1)%taal.beats in taal.taali:
+            if position in taali:
                 taaliKhaliOrNone = 1
-            elif (i + 1)%taal.beats in taal.khali:
+            elif position in khali:
                 taaliKhaliOrNone = -1
-            saam = False
-            if i%taal.beats == 0:
-                saam = True
-            beatSpeed = getSpeed(i + 1)
-            phraseSyllableMapping = list(zip(rawPhrases, syllableCount))
-            try:
-                finalizedBeats.append(Beat(i + 1, taaliKhaliOrNone, saam, phraseSyllableMapping, beatSpeed, markers))
-            except Exception as e:
-                raise AssertionError("Beat could not be initialized.\nDebug Info\n__________\n\nBeat Number: " + str(i + 1) + "\nBeat Speed: " + str(beatSpeed) + "\nMarkers: " + str(markers) + "\nPhrase-Syllable Mapping: " + str(phraseSyllableMapping) + "\nIntermediateString: " + str(intermediate))
+            saam = i % beats == 0
+            beatSpeed = beatSpeeds[i]
+            problem = Beat.validate(phraseSyllableMapping, beatSpeed, markers) #Checked up front instead of catching whatever the constructor raises
+            if problem is not None:
+                raise AssertionError("Beat could not be initialized. " + problem + "\nDebug Info\n__________\n\nBeat Number: " + str(i + 1) + "\nBeat Speed: " + str(beatSpeed) + "\nMarkers: " + str(list(markers)) + "\nPhrase-Syllable Mapping: " + str(phraseSyllableMapping) + "\nIntermediateString: " + str(intermediate))
+            finalizedBeats.append(Beat(i + 1, taaliKhaliOrNone, saam, phraseSyllableMapping, beatSpeed, markers))
         parsedResult = Bol(finalizedBeats)
         compositionType.mainCheck(parsedResult)
         return parsedResult
@@ -1182,11 +1564,12 @@ class BolParser():
 
     @classmethod
     def getSymbolRules(cls):
-        from rich.console import Console
-        from rich.markdown import Markdown
-        console = Console()
-        md = Markdown(BolParser.SYMBOLSMD)
-        console.print(md)
+        if BolParser.console is None:
+            from rich.console import Console #Imported here since it is only needed for showing the symbol rules
+            from rich.markdown import Markdown
+            BolParser.console = Console()
+            BolParser.symbolRules = Markdown(BolParser.SYMBOLSMD)
+        BolParser.console.print(BolParser.symbolRules)
 
     @classmethod
     def getVocabInitializer(cls):
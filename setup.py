@@ -10,18 +10,17 @@ setup(name='Tabalchi',
       author = "Shreyan Mitra",
       install_requires=[
         "jsonschema",
-        "playsound",
         "pydub",
-        "audio_effects",
-        "pyacoustid",
-        "pychromaprint",
-        "typing",
-        "pathlib",
-        "transformers",
-        "torch",
+        "numpy",
         "fsspec",
         "rich"
       ],
+      extras_require={
+        "audio": ["playsound", "audio_effects", "pyacoustid", "pychromaprint"], #Playing sounds and converting audio to bols
+        "ml": ["transformers", "torch"], #Generating compositions
+        "vllm": ["vllm"], #Generating compositions with the vllm backend
+        "fast": ["fastjsonschema"], #The fastjsonschema validation backend
+      },
       include_package_data=True,
       package_data={'': ['static/*']},
       packages=["Tabalchi"],